@@ -1,5 +1,7 @@
 """Configuration management for the regulatory reporting assistant."""
 
+from functools import lru_cache
+
 from pydantic_settings import BaseSettings
 from typing import Optional
 
@@ -18,6 +20,16 @@ class Settings(BaseSettings):
     # Vector Database
     chroma_db_path: str = "./chroma_db"
     embedding_model: str = "all-MiniLM-L6-v2"
+    # Optional path to an ONNX export of the embedding model (see
+    # rag_engine._OnnxEmbedder); falls back to SentenceTransformer if unset
+    embedding_model_onnx_path: Optional[str] = None
+    # HNSW index tuning. Higher construction_ef/M raise recall and memory
+    # at the cost of slower index builds (the graph is rebuilt when a
+    # cleared collection is re-ingested); search_ef trades query latency
+    # for recall.
+    hnsw_construction_ef: int = 200
+    hnsw_m: int = 32
+    hnsw_search_ef: int = 80
     
     # Application Settings
     debug: bool = True
@@ -29,5 +41,15 @@ class Settings(BaseSettings):
         case_sensitive = False
 
 
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Get the cached settings singleton.
+
+    Instantiating Settings re-reads .env and the environment, so the
+    construction is cached to make the singleton explicit and cheap.
+    """
+    return Settings()
+
+
 # Global settings instance
-settings = Settings()
+settings = get_settings()
@@ -1,46 +1,47 @@
 """Document ingestion script for regulatory documents."""
 
-import os
 import sys
+from pathlib import Path
 
-# Add parent directory to path
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Add parent directory to path (once, so re-imports don't duplicate it)
+_PARENT = str(Path(__file__).resolve().parent.parent)
+if _PARENT not in sys.path:
+    sys.path.insert(0, _PARENT)
 
 from backend.rag_engine import get_rag_engine
 
+# Regulatory documents directory, resolved once
+DOCS_DIR = Path(__file__).resolve().parent.parent / "data" / "regulatory_docs"
+
 
 def ingest_all_documents():
     """Ingest all regulatory documents into the vector database."""
-    
+
     print("Initializing RAG engine...")
     rag_engine = get_rag_engine()
-    
+
     # Clear existing collection
     print("Clearing existing documents...")
     rag_engine.clear_collection()
-    
+
     # Define documents to ingest
-    docs_dir = os.path.join(os.path.dirname(__file__), "..", "data", "regulatory_docs")
-    
     documents = [
-        {
-            "path": os.path.join(docs_dir, "pra_rulebook_sample.txt"),
-            "type": "PRA_Rulebook"
-        },
-        {
-            "path": os.path.join(docs_dir, "corep_instructions_sample.txt"),
-            "type": "COREP_Instructions"
-        }
+        (DOCS_DIR / "pra_rulebook_sample.txt", "PRA_Rulebook"),
+        (DOCS_DIR / "corep_instructions_sample.txt", "COREP_Instructions"),
     ]
-    
-    # Ingest each document
-    for doc in documents:
-        if os.path.exists(doc["path"]):
-            print(f"\nIngesting {doc['type']}...")
-            rag_engine.ingest_document(doc["path"], doc["type"])
+
+    # Ingest all documents in one batched pass
+    present = []
+    for path, doc_type in documents:
+        if path.exists():
+            present.append((str(path), doc_type))
         else:
-            print(f"Warning: Document not found: {doc['path']}")
-    
+            print(f"Warning: Document not found: {path}")
+
+    if present:
+        print(f"\nIngesting {len(present)} documents...")
+        rag_engine.ingest_documents(present)
+
     print("\n✓ Document ingestion complete!")
     print(f"Total documents in collection: {rag_engine.collection.count()}")
 
@@ -1,18 +1,128 @@
 """LLM client for regulatory reasoning and structured output generation."""
 
-import json
+import copy
+import hashlib
+import re
+
+import orjson
+from collections import OrderedDict
 from typing import Dict, List, Optional
 from openai import OpenAI
 from backend.config import settings
 
 
+# Precompiled amount-extraction patterns for the demo response path
+_AMOUNT_RE = re.compile(r'£(\d+)\s*million')
+_RETAINED_RE = re.compile(r'£(\d+)\s*million.*retained')
+_INTANGIBLE_RE = re.compile(r'£(\d+)\s*million.*intangible')
+_DEFERRED_RE = re.compile(r'£(\d+)\s*million.*deferred')
+_OWN_RE = re.compile(r'£(\d+)\s*million.*own')
+
+# Word tokenizer for scenario keyword analysis
+_WORD_RE = re.compile(r'[a-z0-9]+')
+
+# Per-chunk character budget for retrieved context in the user prompt.
+# Keeps prompt size (and token cost) bounded when chunks are large.
+_CONTEXT_CHUNK_CHARS = 1500
+
+# Static user-prompt template, filled in via .format() per request
+_USER_PROMPT_TMPL = """User Question:
+"{question}"
+
+Reporting Scenario:
+{scenario}
+
+COREP Template:
+{template_code}
+
+Retrieved Regulatory Context:
+{context_text}
+
+Required Output Schema:
+{{
+  "template": "{template_code}",
+  "fields": [
+    {{
+      "field_code": "C_01.00_rXXX",
+      "field_name": "Field name",
+      "value": "Numeric value or 'N/A' if cannot determine",
+      "justification": "Brief explanation of why this value applies",
+      "source_rule": "Specific regulatory reference (e.g., 'PRA Rulebook 1.1.1')"
+    }}
+  ],
+  "validation_flags": [
+    "List any missing data, ambiguities, or inconsistencies"
+  ],
+  "audit_log": [
+    "Step-by-step reasoning for key decisions"
+  ]
+}}
+
+Instructions:
+- Analyze the scenario against the retrieved regulatory context
+- Populate ONLY the fields that can be determined from the scenario and context
+- For each field, provide:
+  * The value (or "N/A" if cannot determine)
+  * Clear justification based on the scenario
+  * Specific regulatory reference from the context
+- List any validation issues or missing information in validation_flags
+- Provide audit trail showing your reasoning process
+- Be conservative: if unsure, mark as "N/A" and explain in validation_flags
+
+Generate the JSON response now:"""
+
+
 class LLMClient:
     """Client for interacting with LLM for regulatory reporting."""
     
+    # Maximum number of memoized responses to keep
+    _CACHE_SIZE = 512
+
+    # Static system prompt, built once at class definition
+    _SYSTEM_PROMPT = """You are an AI-powered regulatory reporting assistant designed to support UK banks in preparing PRA COREP regulatory returns.
+
+Your task is to:
+1. Understand natural-language regulatory questions and reporting scenarios.
+2. Retrieve and reason over relevant regulatory texts from:
+   - PRA Rulebook
+   - COREP / EBA reporting instructions and taxonomy
+3. Generate structured, auditable outputs aligned with predefined COREP templates.
+
+Scope limitations:
+- Focus only on a constrained subset of COREP templates (e.g. Own Funds or Capital Requirements).
+- Do NOT hallucinate regulatory rules.
+- If required data is missing or ambiguous, explicitly flag it.
+
+Output requirements:
+- Produce structured JSON strictly matching the provided schema.
+- Populate only fields justified by retrieved regulatory text.
+- Provide an audit trail mapping each populated field to the specific regulation paragraph(s) used.
+- Apply basic validation rules and flag inconsistencies.
+
+Tone and behavior:
+- Be precise, conservative, and regulation-aware.
+- Prefer "cannot determine" over assumptions.
+
+CRITICAL: You must ONLY use information from the provided regulatory context. Do not make up rules or interpretations."""
+
     def __init__(self):
-        """Initialize OpenAI client."""
-        self.client = OpenAI(api_key=settings.openai_api_key)
+        """Initialize the client (OpenAI connection is created lazily)."""
+        self._client = None
+        self._api_key = settings.openai_api_key
         self.model = settings.openai_model
+        # LRU memoization of responses keyed on (template, scenario, context)
+        self._response_cache: OrderedDict[bytes, Dict] = OrderedDict()
+
+    @property
+    def client(self) -> OpenAI:
+        """Lazily construct the OpenAI client on first real use.
+
+        In demo mode the client is never needed, so deferring construction
+        avoids the httpx/TLS setup cost on every app boot.
+        """
+        if self._client is None:
+            self._client = OpenAI(api_key=self._api_key)
+        return self._client
     
     def generate_regulatory_response(
         self,
@@ -33,10 +143,21 @@ class LLMClient:
         Returns:
             Structured response with populated fields and audit trail
         """
+        # Check the memoization cache first: demo responses are
+        # deterministic and real responses at low temperature are stable
+        # enough for repeated scenarios
+        cache_key = self._cache_key(scenario, template_code, retrieved_context)
+        cached = self._response_cache.get(cache_key)
+        if cached is not None:
+            self._response_cache.move_to_end(cache_key)
+            return copy.deepcopy(cached)
+
         # Demo mode - return sample response without calling OpenAI
         if settings.demo_mode:
-            return self._generate_demo_response(scenario, template_code, retrieved_context)
-        
+            result = self._generate_demo_response(scenario, template_code, retrieved_context)
+            self._cache_response(cache_key, result)
+            return result
+
         # Build system prompt
         system_prompt = self._build_system_prompt()
         
@@ -46,8 +167,10 @@ class LLMClient:
         )
         
         try:
-            # Call OpenAI API with JSON mode
-            response = self.client.chat.completions.create(
+            # Call OpenAI API with JSON mode, streaming the completion so
+            # tokens are consumed as they arrive instead of holding the
+            # worker for the full generation before any byte is read
+            stream = self.client.chat.completions.create(
                 model=self.model,
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -55,15 +178,24 @@ class LLMClient:
                 ],
                 response_format={"type": "json_object"},
                 temperature=0.1,  # Low temperature for consistency
-                max_tokens=2000
+                max_tokens=2000,
+                stream=True
             )
-            
-            # Parse JSON response
-            content = response.choices[0].message.content
-            result = json.loads(content)
-            
+
+            # Accumulate streamed deltas into the full JSON document
+            parts = []
+            for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+            content = ''.join(parts)
+
+            # Parse JSON response (orjson: C-level parse)
+            result = orjson.loads(content)
+
+            self._cache_response(cache_key, result)
             return result
-            
+
         except Exception as e:
             return {
                 "error": str(e),
@@ -73,33 +205,26 @@ class LLMClient:
                 "audit_log": []
             }
     
-    def _build_system_prompt(self) -> str:
-        """Build the system prompt for the LLM."""
-        return """You are an AI-powered regulatory reporting assistant designed to support UK banks in preparing PRA COREP regulatory returns.
-
-Your task is to:
-1. Understand natural-language regulatory questions and reporting scenarios.
-2. Retrieve and reason over relevant regulatory texts from:
-   - PRA Rulebook
-   - COREP / EBA reporting instructions and taxonomy
-3. Generate structured, auditable outputs aligned with predefined COREP templates.
-
-Scope limitations:
-- Focus only on a constrained subset of COREP templates (e.g. Own Funds or Capital Requirements).
-- Do NOT hallucinate regulatory rules.
-- If required data is missing or ambiguous, explicitly flag it.
+    @staticmethod
+    def _cache_key(scenario: str, template_code: str, retrieved_context: List[Dict]) -> bytes:
+        """Build a compact digest key over the inputs that shape the response."""
+        context_text = ''.join(ctx['content'] for ctx in retrieved_context)
+        return hashlib.blake2b(
+            f"{template_code}|{scenario}|{context_text}".encode(),
+            digest_size=16
+        ).digest()
 
-Output requirements:
-- Produce structured JSON strictly matching the provided schema.
-- Populate only fields justified by retrieved regulatory text.
-- Provide an audit trail mapping each populated field to the specific regulation paragraph(s) used.
-- Apply basic validation rules and flag inconsistencies.
+    def _cache_response(self, cache_key: bytes, result: Dict):
+        """Store a response in the LRU cache (error results are not cached)."""
+        if "error" in result:
+            return
+        self._response_cache[cache_key] = copy.deepcopy(result)
+        if len(self._response_cache) > self._CACHE_SIZE:
+            self._response_cache.popitem(last=False)
 
-Tone and behavior:
-- Be precise, conservative, and regulation-aware.
-- Prefer "cannot determine" over assumptions.
-
-CRITICAL: You must ONLY use information from the provided regulatory context. Do not make up rules or interpretations."""
+    def _build_system_prompt(self) -> str:
+        """Return the precomputed system prompt for the LLM."""
+        return self._SYSTEM_PROMPT
     
     def _build_user_prompt(
         self,
@@ -110,58 +235,25 @@ CRITICAL: You must ONLY use information from the provided regulatory context. Do
     ) -> str:
         """Build the user prompt with context and schema."""
         
-        # Format retrieved context
-        context_text = "\n\n".join([
-            f"[Source: {ctx['metadata'].get('document_type', 'Unknown')}]\n{ctx['content']}"
-            for ctx in retrieved_context
-        ])
-        
-        prompt = f"""User Question:
-"{user_question}"
-
-Reporting Scenario:
-{scenario}
-
-COREP Template:
-{template_code}
-
-Retrieved Regulatory Context:
-{context_text}
-
-Required Output Schema:
-{{
-  "template": "{template_code}",
-  "fields": [
-    {{
-      "field_code": "C_01.00_rXXX",
-      "field_name": "Field name",
-      "value": "Numeric value or 'N/A' if cannot determine",
-      "justification": "Brief explanation of why this value applies",
-      "source_rule": "Specific regulatory reference (e.g., 'PRA Rulebook 1.1.1')"
-    }}
-  ],
-  "validation_flags": [
-    "List any missing data, ambiguities, or inconsistencies"
-  ],
-  "audit_log": [
-    "Step-by-step reasoning for key decisions"
-  ]
-}}
-
-Instructions:
-- Analyze the scenario against the retrieved regulatory context
-- Populate ONLY the fields that can be determined from the scenario and context
-- For each field, provide:
-  * The value (or "N/A" if cannot determine)
-  * Clear justification based on the scenario
-  * Specific regulatory reference from the context
-- List any validation issues or missing information in validation_flags
-- Provide audit trail showing your reasoning process
-- Be conservative: if unsure, mark as "N/A" and explain in validation_flags
+        # Format retrieved context, truncating each chunk to a fixed
+        # character budget so long documents don't blow up the prompt.
+        # Locals are bound once per item to avoid repeated dict lookups.
+        parts = []
+        append = parts.append
+        for ctx in retrieved_context:
+            md = ctx["metadata"]
+            append(
+                f"[Source: {md.get('document_type', 'Unknown')}]\n"
+                f"{ctx['content'][:_CONTEXT_CHUNK_CHARS]}"
+            )
+        context_text = "\n\n".join(parts)
 
-Generate the JSON response now:"""
-        
-        return prompt
+        return _USER_PROMPT_TMPL.format(
+            question=user_question,
+            scenario=scenario,
+            template_code=template_code,
+            context_text=context_text
+        )
     
     def _generate_demo_response(
         self,
@@ -171,17 +263,21 @@ Generate the JSON response now:"""
     ) -> Dict:
         """Generate a demo response without calling OpenAI API."""
         
-        # Analyze scenario for keywords
+        # Analyze scenario for keywords: tokenize once and test set
+        # membership instead of scanning the scenario per keyword
         scenario_lower = scenario.lower()
-        
+        words = _WORD_RE.findall(scenario_lower)
+        tokens = set(words)
+        bigrams = {f"{a} {b}" for a, b in zip(words, words[1:])}
+        trigrams = {f"{a} {b} {c}" for a, b, c in zip(words, words[1:], words[2:])}
+
         # Determine what type of capital is being discussed
         fields = []
-        
-        if "ordinary shares" in scenario_lower or "common equity" in scenario_lower or "cet1" in scenario_lower:
+
+        if "cet1" in tokens or "ordinary shares" in bigrams or "common equity" in bigrams:
             # CET1 scenario
             # Extract amount if mentioned
-            import re
-            amounts = re.findall(r'£(\d+)\s*million', scenario)
+            amounts = _AMOUNT_RE.findall(scenario)
             amount = amounts[0] if amounts else "500"
             
             fields.append({
@@ -192,8 +288,8 @@ Generate the JSON response now:"""
                 "source_rule": "PRA Rulebook 1.1.1 - CET1 capital instruments criteria"
             })
             
-            if "retained earnings" in scenario_lower:
-                retained_amounts = re.findall(r'£(\d+)\s*million.*retained', scenario)
+            if "retained earnings" in bigrams:
+                retained_amounts = _RETAINED_RE.findall(scenario)
                 retained = retained_amounts[0] if retained_amounts else "200"
                 fields.append({
                     "field_code": "C_01.00_r020",
@@ -203,7 +299,7 @@ Generate the JSON response now:"""
                     "source_rule": "PRA Rulebook 1.1.3 - Retained earnings requirements"
                 })
             
-            if "comprehensive income" in scenario_lower or "reserves" in scenario_lower:
+            if "comprehensive income" in bigrams or "reserves" in tokens:
                 fields.append({
                     "field_code": "C_01.00_r030",
                     "field_name": "Accumulated other comprehensive income",
@@ -212,9 +308,9 @@ Generate the JSON response now:"""
                     "source_rule": "PRA Rulebook 1.1.4 - Other comprehensive income"
                 })
         
-        elif "at1" in scenario_lower or "additional tier 1" in scenario_lower or "subordinated bonds" in scenario_lower:
+        elif "at1" in tokens or "additional tier 1" in trigrams or "subordinated bonds" in bigrams:
             # AT1 scenario
-            amounts = re.findall(r'£(\d+)\s*million', scenario)
+            amounts = _AMOUNT_RE.findall(scenario)
             amount = amounts[0] if amounts else "100"
             
             fields.append({
@@ -225,10 +321,10 @@ Generate the JSON response now:"""
                 "source_rule": "PRA Rulebook 1.2.1 - AT1 capital instruments criteria"
             })
         
-        elif "goodwill" in scenario_lower or "intangible" in scenario_lower or "deduction" in scenario_lower:
+        elif "goodwill" in tokens or "intangible" in tokens or "deduction" in tokens:
             # Deductions scenario
-            if "goodwill" in scenario_lower or "intangible" in scenario_lower:
-                amounts = re.findall(r'£(\d+)\s*million.*intangible', scenario)
+            if "goodwill" in tokens or "intangible" in tokens:
+                amounts = _INTANGIBLE_RE.findall(scenario)
                 amount = amounts[0] if amounts else "75"
                 fields.append({
                     "field_code": "C_01.00_r070",
@@ -238,8 +334,8 @@ Generate the JSON response now:"""
                     "source_rule": "PRA Rulebook 2.1.2 - Intangible assets deduction"
                 })
             
-            if "deferred tax" in scenario_lower:
-                amounts = re.findall(r'£(\d+)\s*million.*deferred', scenario)
+            if "deferred tax" in bigrams:
+                amounts = _DEFERRED_RE.findall(scenario)
                 amount = amounts[0] if amounts else "30"
                 fields.append({
                     "field_code": "C_01.00_r080",
@@ -249,8 +345,8 @@ Generate the JSON response now:"""
                     "source_rule": "PRA Rulebook 2.1.3 - Deferred tax assets deduction"
                 })
             
-            if "own" in scenario_lower and "instruments" in scenario_lower:
-                amounts = re.findall(r'£(\d+)\s*million.*own', scenario)
+            if "own" in tokens and "instruments" in tokens:
+                amounts = _OWN_RE.findall(scenario)
                 amount = amounts[0] if amounts else "10"
                 fields.append({
                     "field_code": "C_01.00_r100",
@@ -1,32 +1,129 @@
 """RAG (Retrieval-Augmented Generation) engine for regulatory document retrieval."""
 
 import os
-from typing import List, Dict
+import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import islice
+from typing import Dict, Iterator, List, Tuple
 import chromadb
+import numpy as np
 from chromadb.config import Settings
 from sentence_transformers import SentenceTransformer
 from backend.config import settings
 
 
+class _OnnxEmbedder:
+    """Embedding encoder backed by ONNX Runtime.
+
+    CPU-oriented drop-in for SentenceTransformer.encode: export the model
+    once with `optimum-cli export onnx` (optionally INT8-quantized via
+    `optimum-cli onnxruntime quantize`) and point
+    settings.embedding_model_onnx_path at the export directory. Requires
+    the optional optimum[onnxruntime] extra, imported lazily so the
+    default SentenceTransformer path stays dependency-free.
+    """
+
+    def __init__(self, model_path: str):
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+
+        self.model = ORTModelForFeatureExtraction.from_pretrained(
+            model_path, provider="CPUExecutionProvider"
+        )
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+
+    def encode(self, sentences: List[str], batch_size: int = 32,
+               convert_to_numpy: bool = True, show_progress_bar: bool = False,
+               normalize_embeddings: bool = False) -> np.ndarray:
+        """Encode sentences with mean pooling over the attention mask.
+
+        Output is always L2-normalized, mirroring the Normalize module in
+        the sentence-transformers pipeline for this model family.
+        """
+        pooled_batches = []
+        for start in range(0, len(sentences), batch_size):
+            batch = sentences[start:start + batch_size]
+            inputs = self.tokenizer(
+                batch, padding=True, truncation=True, return_tensors="np"
+            )
+            hidden = self.model(**inputs).last_hidden_state
+            mask = inputs["attention_mask"][:, :, None].astype(hidden.dtype)
+            pooled = (hidden * mask).sum(axis=1) / mask.sum(axis=1).clip(min=1e-9)
+            pooled_batches.append(pooled)
+
+        embeddings = np.concatenate(pooled_batches, axis=0)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True).clip(min=1e-12)
+        return embeddings / norms
+
+
+@lru_cache(maxsize=4)
+def _load_embedder(model_name: str, onnx_path: str = None):
+    """Load an embedding encoder, shared across engine instances.
+
+    The cache means multiple RAGEngine instances (tests, per-tenant
+    engines) reuse one set of model weights instead of paying the load
+    time and RAM per instance.
+    """
+    if onnx_path:
+        return _OnnxEmbedder(onnx_path)
+    return SentenceTransformer(model_name)
+
+
 class RAGEngine:
     """Retrieval-Augmented Generation engine for regulatory documents."""
-    
+
     def __init__(self):
         """Initialize the RAG engine with ChromaDB and embedding model."""
-        self.embedding_model = SentenceTransformer(settings.embedding_model)
-        
+        self.embedding_model = _load_embedder(
+            settings.embedding_model,
+            settings.embedding_model_onnx_path
+        )
+
         # Initialize ChromaDB client
         self.client = chromadb.PersistentClient(
             path=settings.chroma_db_path,
             settings=Settings(anonymized_telemetry=False)
         )
-        
+
         # Get or create collection
-        self.collection = self.client.get_or_create_collection(
+        self.collection = self._get_collection()
+
+        # Warm in-memory copy of the corpus: row-normalized embedding
+        # matrix plus parallel chunk/metadata lists. The regulatory corpus
+        # is small enough to keep resident, so queries become one matrix-
+        # vector product instead of a ChromaDB round-trip.
+        self._emb_matrix = None
+        self._docs: List[str] = []
+        self._metas: List[Dict] = []
+
+        # Bounded cache of query embeddings: repeated questions skip the
+        # transformer forward pass entirely
+        self._encode_query = lru_cache(maxsize=1024)(self._encode_query_uncached)
+
+    def _get_collection(self):
+        """Get or create the regulatory documents collection.
+
+        Embeddings are stored unit-normalized, so inner-product space
+        equals cosine similarity without Chroma normalizing per query.
+        HNSW parameters come from settings and only take effect when the
+        collection is (re)created.
+        """
+        return self.client.get_or_create_collection(
             name="regulatory_documents",
-            metadata={"description": "PRA Rulebook and COREP instructions"}
+            metadata={
+                "description": "PRA Rulebook and COREP instructions",
+                "hnsw:space": "ip",
+                "hnsw:construction_ef": settings.hnsw_construction_ef,
+                "hnsw:M": settings.hnsw_m,
+                "hnsw:search_ef": settings.hnsw_search_ef
+            }
         )
-    
+
+    def _encode_query_uncached(self, query: str) -> np.ndarray:
+        """Encode a single query string to its embedding vector."""
+        return self.embedding_model.encode([query], convert_to_numpy=True)[0]
+
     def ingest_document(self, document_path: str, document_type: str):
         """
         Ingest a regulatory document into the vector database.
@@ -37,26 +134,138 @@ class RAGEngine:
         """
         with open(document_path, 'r', encoding='utf-8') as f:
             content = f.read()
-        
-        # Split document into chunks (by sections/paragraphs)
-        chunks = self._chunk_document(content)
-        
-        # Generate embeddings
-        embeddings = self.embedding_model.encode(chunks).tolist()
-        
-        # Prepare metadata
-        metadatas = [
-            {
-                "document_type": document_type,
-                "source": os.path.basename(document_path),
-                "chunk_index": i
-            }
-            for i in range(len(chunks))
-        ]
-        
+
+        # Stream chunks through encode+add in fixed-size batches so peak
+        # memory is O(batch) rather than O(document)
+        chunk_iter = self._chunk_document(content)
+        offset = 0
+        while batch := list(islice(chunk_iter, self._INGEST_BATCH)):
+            embeddings = self._encode_all(batch)
+            self._add_chunks(batch, embeddings, document_path, document_type,
+                             start_index=offset)
+            offset += len(batch)
+
+    def ingest_documents(self, documents: List[Tuple[str, str]]):
+        """
+        Ingest several regulatory documents with a single encoder pass.
+
+        Reading and chunking all files first, then encoding every chunk in
+        one large batch, amortizes the model invocation overhead that
+        per-document encode calls pay N times.
+
+        Args:
+            documents: (document_path, document_type) pairs to ingest
+        """
+        all_chunks = []
+        spans = []  # (path, type, chunk count) per document, in order
+
+        for document_path, document_type in documents:
+            with open(document_path, 'r', encoding='utf-8') as f:
+                content = f.read()
+            chunks = list(self._chunk_document(content))
+            spans.append((document_path, document_type, len(chunks)))
+            all_chunks.extend(chunks)
+
+        if not all_chunks:
+            return
+
+        # One batched forward pass over the whole corpus
+        embeddings = self._encode_all(all_chunks)
+
+        # Partition chunks and embeddings back per document
+        offset = 0
+        for document_path, document_type, count in spans:
+            self._add_chunks(
+                all_chunks[offset:offset + count],
+                embeddings[offset:offset + count],
+                document_path,
+                document_type
+            )
+            offset += count
+
+    def ingest_directory(self, documents: List[Tuple[str, str]], workers: int = 2):
+        """
+        Ingest documents with file I/O overlapping encoding.
+
+        Worker threads read and chunk upcoming documents while the main
+        thread encodes the current one (the transformer forward pass
+        releases the GIL) and writes it to ChromaDB. Useful for larger
+        corpora where per-document reads would otherwise serialize behind
+        the encoder.
+
+        Args:
+            documents: (document_path, document_type) pairs to ingest
+            workers: Number of reader threads
+        """
+        def _read_and_chunk(doc: Tuple[str, str]):
+            document_path, document_type = doc
+            with open(document_path, 'r', encoding='utf-8') as f:
+                content = f.read()
+            return document_path, document_type, list(self._chunk_document(content))
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for document_path, document_type, chunks in pool.map(_read_and_chunk, documents):
+                if not chunks:
+                    continue
+                embeddings = self._encode_all(chunks)
+                self._add_chunks(chunks, embeddings, document_path, document_type)
+
+    def _encode_all(self, chunks: List[str]):
+        """Encode chunks in batches, deduplicated and sorted by length.
+
+        Boilerplate sections can repeat across regulatory documents, so
+        only unique chunks go through the encoder and the results are
+        fanned back out to every duplicate position. Each batch is padded
+        to its longest member, so unique chunks are encoded in length
+        order to keep short headers and long paragraphs in separate
+        batches. Results come back in input order.
+        """
+        if not chunks:
+            return []
+
+        # Embed each distinct chunk once
+        uniq: Dict[str, int] = {}
+        positions = [uniq.setdefault(c, len(uniq)) for c in chunks]
+        uniq_chunks = list(uniq)
+
+        order = np.argsort([len(c) for c in uniq_chunks])
+        sorted_chunks = [uniq_chunks[i] for i in order]
+        emb_sorted = self.embedding_model.encode(
+            sorted_chunks,
+            batch_size=32,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+            normalize_embeddings=True
+        )
+
+        # Restore unique-chunk order, then expand to the original layout.
+        # Kept as an ndarray: Chroma accepts it directly, and converting
+        # to nested Python floats would box every element
+        uniq_emb = np.empty_like(emb_sorted)
+        uniq_emb[order] = emb_sorted
+        return uniq_emb[positions]
+
+    def _add_chunks(self, chunks: List[str], embeddings, document_path: str,
+                    document_type: str, start_index: int = 0):
+        """Add chunks with their embeddings and metadata to the collection.
+
+        Args:
+            start_index: Index of the first chunk within its document, so
+                streamed batches keep document-wide ids and chunk indices
+        """
+        # Prepare metadata: copy a constant base dict and set only the
+        # varying chunk_index, instead of building each dict literal anew
+        base = {
+            "document_type": document_type,
+            "source": os.path.basename(document_path)
+        }
+        metadatas = [base.copy() for _ in chunks]
+        for i, metadata in enumerate(metadatas, start=start_index):
+            metadata["chunk_index"] = i
+
         # Generate IDs
-        ids = [f"{document_type}_{i}" for i in range(len(chunks))]
-        
+        ids = [f"{document_type}_{start_index + i}" for i in range(len(chunks))]
+
         # Add to collection
         self.collection.add(
             documents=chunks,
@@ -64,43 +273,41 @@ class RAGEngine:
             metadatas=metadatas,
             ids=ids
         )
-        
+
+        # Mirror into the in-memory cache for the query fast path
+        # (embeddings are already unit-normalized by _encode_all)
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if self._emb_matrix is None:
+            self._emb_matrix = matrix
+        else:
+            self._emb_matrix = np.vstack((self._emb_matrix, matrix))
+        self._docs.extend(chunks)
+        self._metas.extend(metadatas)
+
         print(f"Ingested {len(chunks)} chunks from {document_path}")
     
-    def _chunk_document(self, content: str) -> List[str]:
+    # Chunk boundaries: a section/subsection header start or a blank line
+    _SECTION_RE = re.compile(r'(?m)(?=^#{2,3})|\n\s*\n')
+
+    # Minimum chunk size in characters
+    _MIN_CHUNK_CHARS = 50
+
+    # Chunks per encode+add batch when streaming a single document
+    _INGEST_BATCH = 64
+
+    def _chunk_document(self, content: str) -> Iterator[str]:
         """
-        Split document into meaningful chunks.
-        
-        Strategy: Split by sections (## headers) and paragraphs.
+        Split document into meaningful chunks, yielded lazily.
+
+        Strategy: Split by sections (## headers) and paragraphs, using a
+        single compiled-regex pass instead of a line-by-line Python loop.
+        Yielding keeps only one batch of chunks alive at a time when the
+        caller streams them into the encoder.
         """
-        chunks = []
-        current_chunk = []
-        
-        lines = content.split('\n')
-        
-        for line in lines:
-            # New section or subsection
-            if line.startswith('##') or line.startswith('###'):
-                if current_chunk:
-                    chunks.append('\n'.join(current_chunk).strip())
-                    current_chunk = [line]
-                else:
-                    current_chunk.append(line)
-            # Empty line indicates paragraph break
-            elif line.strip() == '':
-                if current_chunk:
-                    chunk_text = '\n'.join(current_chunk).strip()
-                    if len(chunk_text) > 50:  # Minimum chunk size
-                        chunks.append(chunk_text)
-                    current_chunk = []
-            else:
-                current_chunk.append(line)
-        
-        # Add final chunk
-        if current_chunk:
-            chunks.append('\n'.join(current_chunk).strip())
-        
-        return [c for c in chunks if c]  # Filter empty chunks
+        for part in self._SECTION_RE.split(content):
+            part = part.strip()
+            if len(part) > self._MIN_CHUNK_CHARS:
+                yield part
     
     def retrieve_context(self, query: str, n_results: int = None) -> List[Dict]:
         """
@@ -115,35 +322,98 @@ class RAGEngine:
         """
         if n_results is None:
             n_results = settings.max_retrieval_results
-        
-        # Generate query embedding
-        query_embedding = self.embedding_model.encode([query]).tolist()
-        
+
+        # Fast path: pure in-memory similarity when the corpus is resident
+        if self._emb_matrix is not None and len(self._docs):
+            q = self._encode_query(query)
+            q = q / np.linalg.norm(q).clip(min=1e-12)
+            sims = self._emb_matrix @ q
+
+            k = min(n_results, len(self._docs))
+            top = np.argpartition(-sims, k - 1)[:k]
+            top = top[np.argsort(-sims[top])]
+
+            return [
+                {
+                    "content": self._docs[i],
+                    "metadata": self._metas[i],
+                    "distance": float(1.0 - sims[i])
+                }
+                for i in top
+            ]
+
+        # Fallback: query through ChromaDB (e.g. warm cache not built
+        # because the collection was ingested by a previous process)
+        # chromadb 0.5.0 rejects a list-wrapped 1D ndarray, so pass a 2D array
+        query_embedding = self._encode_query(query).reshape(1, -1)
+
         # Query the collection
         results = self.collection.query(
             query_embeddings=query_embedding,
             n_results=n_results
         )
         
-        # Format results
-        context_items = []
-        if results['documents'] and results['documents'][0]:
-            for i, doc in enumerate(results['documents'][0]):
-                context_items.append({
-                    "content": doc,
-                    "metadata": results['metadatas'][0][i] if results['metadatas'] else {},
-                    "distance": results['distances'][0][i] if results['distances'] else 0
-                })
-        
-        return context_items
+        # Format results (truthiness checks hoisted out of the loop)
+        docs = results['documents'][0] if results['documents'] else []
+        metas = results['metadatas'][0] if results['metadatas'] else [{}] * len(docs)
+        dists = results['distances'][0] if results['distances'] else [0] * len(docs)
+
+        return [
+            {"content": doc, "metadata": meta, "distance": dist}
+            for doc, meta, dist in zip(docs, metas, dists)
+        ]
     
+    def retrieve_contexts_batch(self, queries: List[str], n_results: int = None) -> List[List[Dict]]:
+        """
+        Retrieve relevant regulatory context for several queries at once.
+
+        Encoding all queries in one batch amortizes the transformer
+        forward-pass overhead compared to per-query encode calls.
+
+        Args:
+            queries: Natural language queries
+            n_results: Number of results to retrieve per query
+
+        Returns:
+            One list of relevant document chunks (with metadata) per query
+        """
+        if not queries:
+            return []
+
+        if n_results is None:
+            n_results = settings.max_retrieval_results
+
+        # Encode all queries in a single batch (kept as an ndarray)
+        query_embeddings = self.embedding_model.encode(
+            queries, batch_size=32, convert_to_numpy=True
+        )
+
+        # One collection query covers every embedding
+        results = self.collection.query(
+            query_embeddings=query_embeddings,
+            n_results=n_results
+        )
+
+        # Format results per query (truthiness checks hoisted out of the loop)
+        batched_items = []
+        for q in range(len(queries)):
+            docs = results['documents'][q] if results['documents'] else []
+            metas = results['metadatas'][q] if results['metadatas'] else [{}] * len(docs)
+            dists = results['distances'][q] if results['distances'] else [0] * len(docs)
+            batched_items.append([
+                {"content": doc, "metadata": meta, "distance": dist}
+                for doc, meta, dist in zip(docs, metas, dists)
+            ])
+
+        return batched_items
+
     def clear_collection(self):
         """Clear all documents from the collection."""
         self.client.delete_collection("regulatory_documents")
-        self.collection = self.client.get_or_create_collection(
-            name="regulatory_documents",
-            metadata={"description": "PRA Rulebook and COREP instructions"}
-        )
+        self.collection = self._get_collection()
+        self._emb_matrix = None
+        self._docs = []
+        self._metas = []
         print("Collection cleared")
 
 
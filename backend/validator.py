@@ -1,7 +1,31 @@
 """Validation and audit trail system for COREP reporting."""
 
+from collections import defaultdict
 from typing import Dict, List
-from backend.corep_templates import get_template
+
+import numpy as np
+
+from backend.corep_templates import get_field_index, get_template
+
+
+# Consistency rules per template as (row a, row b, message) triples:
+# value(a) must be >= value(b), or > 0 when row b is None. Extending
+# checks to new templates means adding entries here, not code.
+CONSISTENCY_RULES = {
+    "C_01.00": (
+        ("C_01.00_r120", None, "CET1 capital (r120) must be positive"),
+        ("C_01.00_r170", "C_01.00_r120", "Tier 1 capital must be >= CET1 capital"),
+        ("C_01.00_r230", "C_01.00_r170", "Total capital must be >= Tier 1 capital"),
+    ),
+}
+
+
+def _safe_float(value) -> float:
+    """Convert a field value to float, NaN when missing or non-numeric."""
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return np.nan
 
 
 class Validator:
@@ -27,17 +51,20 @@ class Validator:
             validation_flags.append(f"Unknown template: {template_code}")
             return output
         
-        # Validate each field
+        # Field definitions indexed by code (cached per template)
+        field_index = get_field_index(template_code)
+
+        # Validate each field; definitions are collected in parallel for
+        # the vectorized numeric pass below
+        field_defs = []
         for field_data in fields:
             field_code = field_data.get("field_code")
             value = field_data.get("value")
-            
-            # Find field definition
-            field_def = next(
-                (f for f in template.fields if f.field_code == field_code),
-                None
-            )
-            
+
+            # Find field definition (O(1) index lookup)
+            field_def = field_index.get(field_code)
+            field_defs.append(field_def)
+
             if not field_def:
                 validation_flags.append(f"Unknown field code: {field_code}")
                 continue
@@ -60,22 +87,61 @@ class Validator:
                     f"Field {field_code} missing regulatory source reference"
                 )
             
-            # Apply field-specific validation rules
-            for rule in field_def.validation_rules:
-                if "non-negative" in rule.lower() and value != "N/A":
-                    try:
-                        if float(value) < 0:
-                            validation_flags.append(
-                                f"Field {field_code} must be non-negative"
-                            )
-                    except (ValueError, TypeError):
-                        pass
-        
-        # Update validation flags
-        output["validation_flags"] = list(set(validation_flags))  # Remove duplicates
+        # Numeric rules in one vectorized pass: a single conversion sweep
+        # (NaN on failure, comparing false) and boolean masks, instead of
+        # per-field try/except control flow
+        if fields:
+            numeric = np.array(
+                [_safe_float(f.get("value")) for f in fields], dtype=float
+            )
+            non_negative_rule = np.array(
+                [fd is not None and "non-negative" in fd.rule_flags
+                 for fd in field_defs],
+                dtype=bool
+            )
+            for idx in np.where((numeric < 0) & non_negative_rule)[0]:
+                validation_flags.append(
+                    f"Field {fields[idx].get('field_code')} must be non-negative"
+                )
+
+        # Update validation flags (dedup in one pass, preserving order so
+        # the audit output stays stable)
+        output["validation_flags"] = list(dict.fromkeys(validation_flags))
         
         return output
     
+    def validate_many(self, outputs: List[Dict]) -> List[Dict]:
+        """
+        Validate a batch of outputs, e.g. for bulk revalidation jobs.
+
+        Outputs are grouped by template code so the cached template and
+        field index are resolved once per group rather than once per
+        output, then each output runs the standard validation plus
+        consistency checks.
+
+        Args:
+            outputs: LLM-generated outputs with populated fields
+
+        Returns:
+            The outputs, validated in place and in input order
+        """
+        grouped = defaultdict(list)
+        for output in outputs:
+            grouped[output.get("template")].append(output)
+
+        for template_code, group in grouped.items():
+            # Warm the per-template caches once for the whole group
+            get_template(template_code)
+            get_field_index(template_code)
+
+            for output in group:
+                validated = self.validate_output(output)
+                issues = self.check_consistency(validated)
+                if issues:
+                    validated["validation_flags"].extend(issues)
+
+        return outputs
+
     def generate_audit_trail(self, output: Dict) -> List[str]:
         """
         Generate comprehensive audit trail.
@@ -116,39 +182,27 @@ class Validator:
             List of consistency issues
         """
         issues = []
-        fields = output.get("fields", [])
-        
-        # Build field value map
+        rules = CONSISTENCY_RULES.get(output.get("template"), ())
+        if not rules:
+            return issues
+
+        # Build field value map (NaN for missing or non-numeric values;
+        # NaN comparisons are false, so absent rows skip their checks)
         field_values = {}
-        for field_data in fields:
-            field_code = field_data.get("field_code")
-            value = field_data.get("value")
-            try:
-                field_values[field_code] = float(value) if value != "N/A" else None
-            except (ValueError, TypeError):
-                field_values[field_code] = None
-        
-        # Check CET1 calculation (r120 = sum of positive items - r110)
-        # This is a simplified check
-        if "C_01.00_r120" in field_values:
-            cet1 = field_values.get("C_01.00_r120")
-            if cet1 is not None and cet1 <= 0:
-                issues.append("CET1 capital (r120) must be positive")
-        
-        # Check Tier 1 >= CET1
-        if "C_01.00_r170" in field_values and "C_01.00_r120" in field_values:
-            tier1 = field_values.get("C_01.00_r170")
-            cet1 = field_values.get("C_01.00_r120")
-            if tier1 is not None and cet1 is not None and tier1 < cet1:
-                issues.append("Tier 1 capital must be >= CET1 capital")
-        
-        # Check Total Capital >= Tier 1
-        if "C_01.00_r230" in field_values and "C_01.00_r170" in field_values:
-            total = field_values.get("C_01.00_r230")
-            tier1 = field_values.get("C_01.00_r170")
-            if total is not None and tier1 is not None and total < tier1:
-                issues.append("Total capital must be >= Tier 1 capital")
-        
+        for field_data in output.get("fields", []):
+            field_values[field_data.get("field_code")] = _safe_float(
+                field_data.get("value")
+            )
+
+        for code_a, code_b, message in rules:
+            value_a = field_values.get(code_a, np.nan)
+            if code_b is None:
+                # Positivity rule, e.g. CET1 capital (r120)
+                if value_a <= 0:
+                    issues.append(message)
+            elif value_a < field_values.get(code_b, np.nan):
+                issues.append(message)
+
         return issues
 
 